@@ -1,30 +1,87 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
-from pymongo import MongoClient
+from flask import Flask, Blueprint, current_app, g, render_template, request, redirect, url_for, jsonify, session, flash, Response
+from flask import before_render_template, template_rendered
+from werkzeug.local import LocalProxy
+from pymongo import MongoClient, ASCENDING, DESCENDING, InsertOne, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError, DuplicateKeyError
 from bson import ObjectId
+from bson.errors import InvalidId
 import os
 from datetime import datetime, date, timedelta
 import json
+import re
+import csv
+import io
 import secrets
+import tempfile
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from functools import wraps
+from collections import OrderedDict, namedtuple
+import hashlib
+import hmac
+import zlib
+import threading
+import time
+import click
+import mood_stats
+import metrics
 
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+bp = Blueprint('main', __name__, cli_group=None)
+
+# MongoDB-Verbindung (wird pro Prozess beim ersten Zugriff aufgebaut)
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
 
 # E-Mail-Konfiguration (anpassen)
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
 SMTP_USER = os.getenv("SMTP_USER", "your-email@gmail.com")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "your-app-password")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL", "your-email@gmail.com")
 
+# Postausgang: Hintergrund-Versand mit wiederverwendeten SMTP-Verbindungen
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_POLL_SECONDS = int(os.getenv("EMAIL_POLL_SECONDS", "10"))
+EMAIL_IDLE_SECONDS = int(os.getenv("EMAIL_IDLE_SECONDS", "60"))
+
+# Cache für die Diagramm-Daten
+MOOD_CACHE_TTL = int(os.getenv("MOOD_CACHE_TTL", "300"))
+MOOD_CACHE_SIZE = int(os.getenv("MOOD_CACHE_SIZE", "1024"))
+MOOD_CACHE_REDIS_URL = os.getenv("MOOD_CACHE_REDIS_URL")
+
+# Wie lange Rolle/Aktiv-Status eines Benutzers ohne Datenbankabfrage vertraut wird. Ohne Redis erfahren
+# andere Worker nichts von einer Rollenänderung, daher dann nur wenige Sekunden.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60" if MOOD_CACHE_REDIS_URL else "5"))
+
+# Messwerte: /metrics ist für Admins oder mit "Authorization: Bearer <METRICS_TOKEN>" abrufbar
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+
+_mongo_settings = {
+    'MONGODB_URI': MONGODB_URI,
+    'MONGO_MAX_POOL_SIZE': MONGO_MAX_POOL_SIZE,
+    'MONGO_MIN_POOL_SIZE': MONGO_MIN_POOL_SIZE,
+}
+_mongo_state = {'pid': None, 'client': None}
+_mongo_lock = threading.RLock()
+
+
 def create_mongo_client() -> MongoClient:
     """Create a MongoDB client; fall back to in-memory mongomock if real DB is unavailable."""
-    mongodb_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
     try:
-        client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=500)
+        client = MongoClient(
+            _mongo_settings['MONGODB_URI'],
+            serverSelectionTimeoutMS=500,
+            maxPoolSize=_mongo_settings['MONGO_MAX_POOL_SIZE'],
+            minPoolSize=_mongo_settings['MONGO_MIN_POOL_SIZE'],
+            event_listeners=[metrics.MongoCommandMetrics()]
+        )
         client.admin.command("ping")
         return client
     except Exception:
@@ -38,11 +95,158 @@ def create_mongo_client() -> MongoClient:
         return mongomock.MongoClient()
 
 
-client = create_mongo_client()
+class InProcessCacheBackend:
+    """Thread-safe LRU cache with per-entry TTL, local to one process."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCacheBackend:
+    """Cache backend shared by all workers, backed by Redis."""
+
+    def __init__(self, url):
+        try:
+            import redis  # type: ignore
+        except Exception as exc:
+            raise RuntimeError(
+                "MOOD_CACHE_REDIS_URL ist gesetzt, aber 'redis' ist nicht installiert. "
+                "Installiere redis (pip install redis) oder entferne MOOD_CACHE_REDIS_URL."
+            ) from exc
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, value, ex=ttl)
+
+    def get_counter(self, key):
+        return int(self._redis.get(key) or 0)
+
+    def incr(self, key):
+        return self._redis.incr(key)
+
+
+class MoodDataCache:
+    """Per-user cache of serialized chart data; keys carry a version that every write of the user bumps.
+
+    The backend counter is per-process unless Redis is used, so the keys also carry the
+    session's data_version, which travels with the user's cookie to every worker.
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _key(self, user_id, params, session_version):
+        version = self.backend.get_counter(f"mood-version:{user_id}")
+        return f"mood-data:{user_id}:{version}:{session_version}:{params}"
+
+    def get(self, user_id, params, session_version=''):
+        return self.backend.get(self._key(user_id, params, session_version))
+
+    def set(self, user_id, params, body, session_version=''):
+        self.backend.set(self._key(user_id, params, session_version), body, self.ttl)
+
+    def invalidate(self, user_id):
+        self.backend.incr(f"mood-version:{user_id}")
+
+
+def create_cache_backend():
+    if MOOD_CACHE_REDIS_URL:
+        return RedisCacheBackend(MOOD_CACHE_REDIS_URL)
+    return InProcessCacheBackend(MOOD_CACHE_SIZE)
 
-db = client["launetracker"]
-mood_collection = db["moods"]
-user_collection = db["users"]
+
+def get_mongo_client():
+    """Return this process's MongoClient, creating it on first use and again after a fork."""
+    if _mongo_state['pid'] == os.getpid():
+        return _mongo_state['client']
+    with _mongo_lock:
+        if _mongo_state['pid'] != os.getpid():
+            client = create_mongo_client()
+            _mongo_state.update(pid=os.getpid(), client=client)
+            # Die In-Memory-Datenbank ist bei jedem Start leer, daher hier statt per CLI einrichten
+            if type(client).__module__.startswith('mongomock'):
+                bootstrap_on_start()
+    return _mongo_state['client']
+
+
+def get_db():
+    return get_mongo_client()["launetracker"]
+
+
+db = LocalProxy(get_db)
+mood_collection = LocalProxy(lambda: get_db()["moods"])
+user_collection = LocalProxy(lambda: get_db()["users"])
+rollup_collection = LocalProxy(lambda: get_db()["daily_rollups"])
+outbox_collection = LocalProxy(lambda: get_db()["outbox"])
+cohort_daily_collection = LocalProxy(lambda: get_db()["cohort_daily"])
+cohort_weekly_collection = LocalProxy(lambda: get_db()["cohort_weekly"])
+
+cache_backend = create_cache_backend()
+mood_cache = MoodDataCache(cache_backend, MOOD_CACHE_TTL)
+
+# Index-Spezifikation: (Collection, Schlüssel, Optionen)
+INDEX_SPECS = [
+    ('moods', [('user_id', ASCENDING), ('date', ASCENDING)], {'name': 'user_id_date'}),
+    ('moods', [('user_id', ASCENDING), ('idempotency_key', ASCENDING)],
+     {'name': 'user_id_idempotency_key_unique', 'unique': True,
+      'partialFilterExpression': {'idempotency_key': {'$exists': True}}}),
+    ('users', [('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+    ('users', [('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'created_at_id'}),
+    ('daily_rollups', [('user_id', ASCENDING), ('date', ASCENDING)], {'name': 'user_id_date_unique', 'unique': True}),
+    ('daily_rollups', [('user_id', ASCENDING), ('week', ASCENDING)], {'name': 'user_id_week'}),
+    ('users', [('role', ASCENDING), ('active', ASCENDING)], {'name': 'role_active'}),
+    ('cohort_daily', [('date', ASCENDING)], {'name': 'date_unique', 'unique': True}),
+    ('cohort_weekly', [('week', ASCENDING)], {'name': 'week_unique', 'unique': True}),
+    ('outbox', [('status', ASCENDING), ('next_attempt_at', ASCENDING)], {'name': 'status_next_attempt_at'}),
+    ('outbox', [('created_at', DESCENDING)], {'name': 'created_at'}),
+]
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_FIELDS = ('date', 'motivation', 'mood', 'wellbeing', 'note', 'created_at')
+
+USER_PAGE_SIZE = 50
+USER_LIST_PROJECTION = {'email': 1, 'role': 1, 'created_at': 1, 'active': 1}
+
+MOOD_FIELDS = ('motivation', 'mood', 'wellbeing')
+MOOD_MIN, MOOD_MAX = -5, 5
+MOOD_BATCH_MAX_ENTRIES = 500
+MOOD_MIN_DATE = date(2000, 1, 1)
+GRANULARITIES = ('day', 'week', 'month', 'year')
 
 
 def create_admin_if_not_exists():
@@ -64,11 +268,320 @@ def remove_user_if_exists(email: str) -> None:
         pass
 
 
+def ensure_indexes():
+    """Create all indexes from INDEX_SPECS; already existing indexes are left untouched."""
+    for collection_name, keys, options in INDEX_SPECS:
+        try:
+            db[collection_name].create_index(keys, **options)
+        except PyMongoError as e:
+            print(f"Index {options['name']} auf {collection_name} konnte nicht angelegt werden: {e}")
+
+
+def _route_queries():
+    """The hot queries of the routes as (route, collection, filter, sort), with placeholder values."""
+    current_month = date.today().replace(day=1)
+    next_month = (current_month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    user_id = str(ObjectId())
+    month_range = {'$gte': current_month.isoformat(), '$lt': next_month.isoformat()}
+    return [
+        ('login', user_collection, {'email': 'admin@launetracker.com', 'password': '', 'active': True}, None),
+        ('create_user', user_collection, {'email': 'admin@launetracker.com'}, None),
+        ('admin_dashboard', user_collection, {}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+        ('mood_tracker', mood_collection, {'user_id': user_id, 'date': month_range}, [('date', ASCENDING)]),
+        ('get_mood_data', rollup_collection, {'user_id': user_id, 'date': month_range, 'count': {'$gt': 0}}, None),
+    ]
+
+
+def _plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+@bp.cli.command('index-report')
+def index_report_command():
+    """Anfragepläne der Routen mit explain() ausgeben; Exit-Code 1 bei COLLSCAN."""
+    collscans = 0
+    for route, collection, query, sort in _route_queries():
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+        except (AttributeError, NotImplementedError):
+            click.echo(f"{route}: explain() wird von diesem Client nicht unterstützt")
+            continue
+        stages = _plan_stages(plan)
+        if 'COLLSCAN' in stages:
+            collscans += 1
+        click.echo(f"{route} ({collection.name}): {' <- '.join(stages)}")
+    if collscans:
+        click.echo(f"{collscans} Anfrage(n) ohne Index (COLLSCAN)")
+        raise SystemExit(1)
+
+
+def _week_start(day):
+    """Return the ISO date of the Monday of the week containing the ISO date string `day`."""
+    try:
+        parsed = date.fromisoformat(day)
+    except (TypeError, ValueError):
+        return day
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+def _apply_rollup(user_id, day, entry, sign=1, count=1):
+    """Add (sign=1) or remove (sign=-1) `count` mood entries, whose values are summed in `entry`, from the daily rollup.
+
+    Returns the entry count of the day before and after the change.
+    """
+    increments = {f"{field}_sum": sign * entry[field] for field in MOOD_FIELDS}
+    increments['count'] = sign * count
+    rollup = rollup_collection.find_one_and_update(
+        {'user_id': user_id, 'date': day},
+        {'$inc': increments, '$setOnInsert': {'week': _week_start(day)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if sign < 0:
+        rollup_collection.delete_one({'user_id': user_id, 'date': day, 'count': {'$lte': 0}})
+    return rollup['count'] - sign * count, rollup['count']
+
+
+def _record_mood_change(user_id, entries, sign=1):
+    """Apply added (sign=1) or removed (sign=-1) mood entries of one user to the rollups, the cohort and the caches."""
+    by_day = {}
+    for entry in entries:
+        by_day.setdefault(entry['date'], []).append(entry)
+    # Rolle direkt aus der Datenbank: der auth_cache kann in anderen Workern noch die alte Rolle halten
+    try:
+        user = user_collection.find_one({'_id': ObjectId(user_id)}, {'role': 1})
+    except InvalidId:
+        user = None
+    in_cohort = user is not None and user.get('role') == 'teilnehmer'
+    for day, day_entries in by_day.items():
+        sums = {field: sum(entry[field] for entry in day_entries) for field in MOOD_FIELDS}
+        before, after = _apply_rollup(user_id, day, sums, sign, len(day_entries))
+        if not in_cohort:
+            continue
+        participant = 1 if before <= 0 < after else -1 if after <= 0 < before else 0
+        _apply_cohort_day(day, day_entries, sign, participant)
+        if participant:
+            # Erster bzw. letzter Eintragstag des Benutzers in dieser Woche?
+            days_in_week = rollup_collection.count_documents({'user_id': user_id, 'week': _week_start(day)})
+            if (participant > 0 and days_in_week == 1) or (participant < 0 and days_in_week == 0):
+                _apply_cohort_week(_week_start(day), participant)
+    mood_cache.invalidate(user_id)
+
+
+def _apply_cohort_day(day, entries, sign, participants):
+    increments = {'count': sign * len(entries), 'participants': participants}
+    for field in MOOD_FIELDS:
+        increments[f"{field}_sum"] = sign * sum(entry[field] for entry in entries)
+        for entry in entries:
+            key = f"{field}_hist.{entry[field]}"
+            increments[key] = increments.get(key, 0) + sign
+    cohort_daily_collection.update_one(
+        {'date': day},
+        {'$inc': increments, '$setOnInsert': {'week': _week_start(day)}},
+        upsert=True
+    )
+
+
+def _apply_cohort_week(week, participants):
+    cohort_weekly_collection.update_one({'week': week}, {'$inc': {'participants': participants}}, upsert=True)
+
+
+def _shift_user_in_cohort(user_id, sign):
+    """Add (sign=1) or remove (sign=-1) all entries of one user to or from the cohort aggregate, e.g. on a role change."""
+    projection = {'_id': 0, 'date': 1}
+    for field in MOOD_FIELDS:
+        projection[field] = 1
+    by_day = {}
+    for mood in mood_collection.find({'user_id': user_id}, projection):
+        by_day.setdefault(mood['date'], []).append(mood)
+    for day, day_entries in by_day.items():
+        _apply_cohort_day(day, day_entries, sign, sign)
+    for week in {_week_start(day) for day in by_day}:
+        _apply_cohort_week(week, sign)
+
+
+def rebuild_cohort():
+    """Recompute cohort_daily and cohort_weekly from the entries of all current participants."""
+    participant_ids = [str(user['_id']) for user in user_collection.find({'role': 'teilnehmer'}, {'_id': 1})]
+    match = {'$match': {'user_id': {'$in': participant_ids}}}
+    group = {'_id': '$date', 'count': {'$sum': 1}}
+    for field in MOOD_FIELDS:
+        group[f"{field}_sum"] = {'$sum': f"${field}"}
+    days = {row['_id']: row for row in mood_collection.aggregate([match, {'$group': group}])}
+    for day, row in days.items():
+        del row['_id']
+        row.update(date=day, week=_week_start(day), participants=0)
+        for field in MOOD_FIELDS:
+            row[f"{field}_hist"] = {}
+    for row in mood_collection.aggregate([
+        match,
+        {'$group': {'_id': {'date': '$date', 'user_id': '$user_id'}}},
+        {'$group': {'_id': '$_id.date', 'participants': {'$sum': 1}}}
+    ]):
+        days[row['_id']]['participants'] = row['participants']
+    for field in MOOD_FIELDS:
+        for row in mood_collection.aggregate([
+            match,
+            {'$group': {'_id': {'date': '$date', 'value': f"${field}"}, 'count': {'$sum': 1}}}
+        ]):
+            days[row['_id']['date']][f"{field}_hist"][str(row['_id']['value'])] = row['count']
+    weeks = [{'week': row['_id'], 'participants': row['participants']} for row in rollup_collection.aggregate([
+        {'$match': {'user_id': {'$in': participant_ids}, 'count': {'$gt': 0}}},
+        {'$group': {'_id': {'week': '$week', 'user_id': '$user_id'}}},
+        {'$group': {'_id': '$_id.week', 'participants': {'$sum': 1}}}
+    ])]
+    cohort_daily_collection.delete_many({})
+    cohort_weekly_collection.delete_many({})
+    if days:
+        cohort_daily_collection.insert_many(list(days.values()))
+    if weeks:
+        cohort_weekly_collection.insert_many(weeks)
+    return len(days), len(weeks)
+
+
+@bp.cli.command('cohort-rebuild')
+def cohort_rebuild_command():
+    """Gruppen-Auswertung (cohort_daily, cohort_weekly) neu aufbauen, z. B. nächtlich per Cron."""
+    days, weeks = rebuild_cohort()
+    click.echo(f"{days} Tage und {weeks} Wochen der Gruppen-Auswertung geschrieben.")
+
+
+def _aggregate_rollups_from_moods(match=None):
+    """Recompute rollup documents from the raw moods collection."""
+    group = {'_id': {'user_id': '$user_id', 'date': '$date'}, 'count': {'$sum': 1}}
+    for field in MOOD_FIELDS:
+        group[f"{field}_sum"] = {'$sum': f"${field}"}
+    pipeline = [{'$match': match or {}}, {'$group': group}]
+    for row in mood_collection.aggregate(pipeline):
+        day = row['_id']['date']
+        rollup = {'user_id': row['_id']['user_id'], 'date': day, 'week': _week_start(day), 'count': row['count']}
+        for field in MOOD_FIELDS:
+            rollup[f"{field}_sum"] = row[f"{field}_sum"]
+        yield rollup
+
+
+def rebuild_daily_rollups(user_id=None):
+    """Rebuild daily rollups from moods, for one user or for everybody. Returns the number of rollups written."""
+    match = {'user_id': user_id} if user_id else {}
+    rollup_collection.delete_many(match)
+    rollups = list(_aggregate_rollups_from_moods(match))
+    if rollups:
+        rollup_collection.insert_many(rollups)
+    return len(rollups)
+
+
+def check_daily_rollups(user_id=None):
+    """Compare stored rollups against moods and return a list of (user_id, date, expected, actual) mismatches."""
+    match = {'user_id': user_id} if user_id else {}
+    keys = ['week', 'count'] + [f"{field}_sum" for field in MOOD_FIELDS]
+    expected = {(r['user_id'], r['date']): r for r in _aggregate_rollups_from_moods(match)}
+    actual = {(r['user_id'], r['date']): r for r in rollup_collection.find(match)}
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        exp = {k: expected[key][k] for k in keys} if key in expected else None
+        act = {k: actual[key].get(k) for k in keys} if key in actual else None
+        if exp != act:
+            mismatches.append((key[0], key[1], exp, act))
+    return mismatches
+
+
+@bp.cli.command('rollups-rebuild')
+@click.option('--user-id', default=None, help='Nur die Rollups dieses Benutzers neu aufbauen.')
+def rollups_rebuild_command(user_id):
+    """Tages-Rollups aus der moods-Collection neu aufbauen."""
+    count = rebuild_daily_rollups(user_id)
+    click.echo(f"{count} Tages-Rollups geschrieben.")
+
+
+@bp.cli.command('rollups-check')
+@click.option('--user-id', default=None, help='Nur die Rollups dieses Benutzers prüfen.')
+@click.option('--fix', is_flag=True, help='Bei Abweichungen die Rollups neu aufbauen.')
+def rollups_check_command(user_id, fix):
+    """Tages-Rollups gegen die moods-Collection prüfen."""
+    mismatches = check_daily_rollups(user_id)
+    for uid, day, expected, actual in mismatches:
+        click.echo(f"{uid} {day}: erwartet {expected}, gespeichert {actual}")
+    if not mismatches:
+        click.echo("Alle Tages-Rollups sind konsistent.")
+        return
+    if fix:
+        count = rebuild_daily_rollups(user_id)
+        click.echo(f"{count} Tages-Rollups neu geschrieben.")
+    else:
+        raise SystemExit(1)
+
+
+AuthInfo = namedtuple('AuthInfo', ['role', 'active'])
+
+
+class AuthCache:
+    """TTL-bounded map user_id -> (AuthInfo or None, version, expiry); an entry is only trusted while its version matches the backend's."""
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the AuthInfo of a user, or None if the user does not exist."""
+        version = self.backend.get_counter(f"auth-version:{user_id}")
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[1] == version and entry[2] > now:
+            return entry[0]
+        try:
+            user = user_collection.find_one({"_id": ObjectId(user_id)}, {'role': 1, 'active': 1})
+        except InvalidId:
+            user = None
+        info = AuthInfo(user.get('role'), user.get('active', False)) if user else None
+        with self._lock:
+            if len(self._entries) > 10000:
+                self._entries = {k: v for k, v in self._entries.items() if v[2] > now}
+            self._entries[user_id] = (info, version, now + self.ttl)
+        return info
+
+    def invalidate(self, user_id):
+        self.backend.incr(f"auth-version:{user_id}")
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+auth_cache = AuthCache(cache_backend, AUTH_CACHE_TTL)
+
+
+def _current_auth():
+    """AuthInfo of the logged-in user, or None (and the session is cleared) if deleted or deactivated."""
+    info = auth_cache.get(session['user_id'])
+    if info is None or not info.active:
+        session.clear()
+        return None
+    if session.get('user_role') != info.role:
+        session['user_role'] = info.role
+    return info
+
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
+        if _current_auth() is None:
+            flash('Dein Zugang ist nicht mehr aktiv', 'error')
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -77,42 +590,228 @@ def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
-        user = user_collection.find_one({"_id": ObjectId(session['user_id'])})
-        if not user or user.get('role') != 'admin':
+            return redirect(url_for('main.login'))
+        info = _current_auth()
+        if info is None:
+            flash('Dein Zugang ist nicht mehr aktiv', 'error')
+            return redirect(url_for('main.login'))
+        if info.role != 'admin':
             flash('Admin-Berechtigung erforderlich', 'error')
-            return redirect(url_for('mood_tracker'))
+            return redirect(url_for('main.mood_tracker'))
         return f(*args, **kwargs)
     return decorated_function
 
 
-def send_email(to_email, subject, body):
+def open_smtp_connection():
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+    try:
+        server.ehlo()
+        if SMTP_STARTTLS:
+            server.starttls()
+            # STARTTLS setzt die EHLO-Antwort zurück, AUTH wird erst danach angeboten
+            server.ehlo()
+        if SMTP_PASSWORD:
+            server.login(SMTP_USER, SMTP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_email(to_email, subject, body, server=None):
+    """Send one mail, over `server` if given (the connection stays open), otherwise over a new connection."""
+    msg = MIMEMultipart()
+    msg['From'] = SENDER_EMAIL
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    started = time.perf_counter()
+    result = 'error'
+    try:
+        if server is not None:
+            server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
+        else:
+            server = open_smtp_connection()
+            try:
+                server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
+            finally:
+                server.quit()
+        result = 'ok'
+    finally:
+        metrics.smtp_send_duration.observe(time.perf_counter() - started, result)
+
+
+def enqueue_email(to_email, subject, body):
+    """Store a mail in the outbox and wake up the background workers."""
+    return enqueue_emails([(to_email, subject, body)])[0]
+
+
+def enqueue_emails(messages):
+    """Store several (to, subject, body) mails in the outbox with one insert and wake up the workers."""
+    if not messages:
+        return []
+    now = datetime.now().isoformat()
+    result = outbox_collection.insert_many([{
+        'to': to_email,
+        'subject': subject,
+        'body': body,
+        'status': 'pending',
+        'attempts': 0,
+        'last_error': None,
+        'created_at': now,
+        'next_attempt_at': now,
+        'sent_at': None
+    } for to_email, subject, body in messages])
+    email_outbox.wake()
+    return result.inserted_ids
+
+
+def _welcome_email(email, password):
+    subject = "Zugang zum LauneTracker"
+    body = f"""
+Willkommen beim LauneTracker!
+
+Zugangsdaten:
+E-Mail: {email}
+Passwort: {password}
+
+Login: {request.host_url}login
+Bitte ändere dein Passwort nach der ersten Anmeldung unter "Passwort ändern".
+"""
+    return subject, body
+
+
+class EmailOutbox:
+    """Pool of daemon threads that drain the outbox collection, each over its own long-lived SMTP connection."""
+
+    # Nach dieser Zeit gilt ein Eintrag im Status 'sending' als verwaist (Worker abgestürzt)
+    STALE_SENDING_SECONDS = 600
+
+    def __init__(self, workers, batch_size):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        """Start the worker threads once per process (again after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _claim(self):
+        now = datetime.now()
+        stale = (now - timedelta(seconds=self.STALE_SENDING_SECONDS)).isoformat()
+        return outbox_collection.find_one_and_update(
+            {'$or': [
+                {'status': 'pending', 'next_attempt_at': {'$lte': now.isoformat()}},
+                {'status': 'sending', 'claimed_at': {'$lt': stale}}
+            ]},
+            {'$set': {'status': 'sending', 'claimed_at': now.isoformat()}},
+            sort=[('next_attempt_at', ASCENDING)]
+        )
+
+    def _mark_sent(self, mail):
+        outbox_collection.update_one(
+            {'_id': mail['_id']},
+            {'$set': {'status': 'sent', 'sent_at': datetime.now().isoformat(), 'last_error': None},
+             '$inc': {'attempts': 1},
+             '$unset': {'body': '', 'claimed_at': ''}}
+        )
+
+    def _mark_failed(self, mail, error):
+        attempts = mail.get('attempts', 0) + 1
+        delay = EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        outbox_collection.update_one(
+            {'_id': mail['_id']},
+            {'$set': {
+                'status': 'failed' if attempts >= EMAIL_MAX_ATTEMPTS else 'pending',
+                'attempts': attempts,
+                'last_error': str(error),
+                'next_attempt_at': (datetime.now() + timedelta(seconds=delay)).isoformat()
+            },
+             '$unset': {'claimed_at': ''}}
+        )
+
+    def drain_batch(self, server):
+        """Send up to batch_size due mails over `server`; returns (server, number of mails handled)."""
+        handled = 0
+        while handled < self.batch_size:
+            mail = self._claim()
+            if mail is None:
+                break
+            handled += 1
+            try:
+                if server is None:
+                    server = open_smtp_connection()
+                send_email(mail['to'], mail['subject'], mail['body'], server=server)
+            except Exception as e:
+                print(f"E-Mail-Fehler: {e}")
+                self._mark_failed(mail, e)
+                server = _close_smtp_connection(server)
+                continue
+            self._mark_sent(mail)
+        return server, handled
+
+    def _run(self):
+        server = None
+        last_used = time.monotonic()
+        while True:
+            try:
+                server, handled = self.drain_batch(server)
+            except PyMongoError as e:
+                print(f"Postausgang nicht erreichbar: {e}")
+                handled = 0
+            if handled:
+                last_used = time.monotonic()
+                continue
+            if server is not None and time.monotonic() - last_used > EMAIL_IDLE_SECONDS:
+                server = _close_smtp_connection(server, quit=True)
+            self._wakeup.wait(EMAIL_POLL_SECONDS)
+            self._wakeup.clear()
+
+
+def _close_smtp_connection(server, quit=False):
+    if server is None:
+        return None
     try:
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(SENDER_EMAIL, to_email, text)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"E-Mail-Fehler: {e}")
-        return False
-
-
-@app.route('/')
+        if quit:
+            server.quit()
+        else:
+            server.close()
+    except Exception:
+        pass
+    return None
+
+
+email_outbox = EmailOutbox(EMAIL_WORKERS, EMAIL_BATCH_SIZE)
+
+
+@bp.before_app_request
+def start_email_outbox():
+    # Liegengebliebene Mails nach einem Neustart ohne neuen Auftrag weiterversenden
+    if SMTP_USER != "your-email@gmail.com":
+        email_outbox.ensure_started()
+
+
+@bp.route('/')
 def home():
     if 'user_id' in session:
-        return redirect(url_for('mood_tracker'))
+        return redirect(url_for('main.mood_tracker'))
     return render_template('home.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
@@ -123,26 +822,62 @@ def login():
             session['user_email'] = user['email']
             session['user_role'] = user['role']
             flash('Erfolgreich angemeldet!', 'success')
-            return redirect(url_for('mood_tracker'))
+            return redirect(url_for('main.mood_tracker'))
         flash('Ungültige E-Mail oder Passwort', 'error')
     return render_template('login.html')
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('Erfolgreich abgemeldet!', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 
-@app.route('/admin')
+@bp.route('/admin')
 @admin_required
 def admin_dashboard():
-    users = list(user_collection.find().sort("created_at", -1))
-    return render_template('admin_dashboard.html', users=users)
+    filters = {
+        'email': request.args.get('email', '').strip(),
+        'role': request.args.get('role', ''),
+        'active': request.args.get('active', ''),
+    }
+    query = _user_list_query(filters)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, last_id = cursor.rsplit('|', 1)
+            query = {'$and': [query, {'$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': ObjectId(last_id)}}
+            ]}]}
+        except (ValueError, InvalidId):
+            return redirect(url_for('main.admin_dashboard', **filters))
+    users = list(user_collection.find(query, USER_LIST_PROJECTION)
+                 .sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+                 .limit(USER_PAGE_SIZE + 1))
+    next_cursor = None
+    if len(users) > USER_PAGE_SIZE:
+        users = users[:USER_PAGE_SIZE]
+        next_cursor = f"{users[-1]['created_at']}|{users[-1]['_id']}"
+    return render_template('admin_dashboard.html', users=users, filters=filters,
+                           next_cursor=next_cursor, is_first_page=not cursor)
+
 
+def _user_list_query(filters):
+    query = {}
+    if filters['email']:
+        query['email'] = {'$regex': '^' + re.escape(filters['email'])}
+    if filters['role'] in ('admin', 'teilnehmer'):
+        query['role'] = filters['role']
+    if filters['active'] == 'ja':
+        query['active'] = True
+    elif filters['active'] == 'nein':
+        query['active'] = {'$ne': True}
+    return query
 
-@app.route('/admin/create-user', methods=['GET', 'POST'])
+
+@bp.route('/admin/create-user', methods=['GET', 'POST'])
 @admin_required
 def create_user():
     if request.method == 'POST':
@@ -162,70 +897,259 @@ def create_user():
         }
         user_collection.insert_one(user_data)
         if SMTP_USER != "your-email@gmail.com":
-            subject = "Zugang zum LauneTracker"
-            body = f"""
-Willkommen beim LauneTracker!
-
-Zugangsdaten:
-E-Mail: {email}
-Passwort: {generated_password}
-
-Login: {request.host_url}login
-Bitte ändere dein Passwort nach der ersten Anmeldung unter "Passwort ändern".
-"""
-            if send_email(email, subject, body):
-                flash(f'Benutzer {email} erstellt und E-Mail gesendet', 'success')
-            else:
-                flash(f'Benutzer {email} erstellt, aber E-Mail-Versand fehlgeschlagen. Passwort: {generated_password}', 'warning')
+            enqueue_email(email, *_welcome_email(email, generated_password))
+            flash(f'Benutzer {email} erstellt, die Zugangsdaten werden per E-Mail versendet', 'success')
         else:
             flash(f'Benutzer {email} erstellt mit Passwort: {generated_password}', 'success')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     return render_template('create_user.html')
 
 
-@app.route('/admin/delete-user/<user_id>')
+@bp.route('/admin/import-users', methods=['GET', 'POST'])
+@admin_required
+def import_users():
+    if request.method == 'POST':
+        upload = request.files.get('csv_file')
+        if not upload or not upload.filename:
+            flash('Bitte eine CSV-Datei auswählen', 'error')
+            return render_template('import_users.html')
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            flash('Die Datei muss UTF-8-kodiert sein', 'error')
+            return render_template('import_users.html')
+        results = _import_users_from_csv(text)
+        created = sum(1 for row in results if row['status'] == 'erstellt')
+        flash(f'{created} von {len(results)} Benutzern erstellt', 'success' if created == len(results) else 'warning')
+        return render_template('import_users.html', results=results,
+                               show_passwords=SMTP_USER == "your-email@gmail.com")
+    return render_template('import_users.html')
+
+
+IMPORT_EMAIL_PATTERN = re.compile(r'[^@\s,;]+@[^@\s,;]+\.[^@\s,;]+')
+
+
+def _csv_delimiter(text):
+    """';' (Excel with German locale) if the first non-empty line has more ';' than ',', otherwise ','."""
+    first_line = next((line for line in text.splitlines() if line.strip()), '')
+    return ';' if first_line.count(';') > first_line.count(',') else ','
+
+
+def _import_users_from_csv(text):
+    """Create users from CSV rows 'email,role' (or 'email;role') with one duplicate query and one insert; returns a per-row report.
+
+    Duplicates are detected case-insensitively, both within the file and against existing users.
+    """
+    results = []
+    seen = set()
+    for line_no, row in enumerate(csv.reader(io.StringIO(text), delimiter=_csv_delimiter(text)), start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        email = row[0].strip()
+        role = (row[1].strip().lower() if len(row) > 1 else '') or 'teilnehmer'
+        if line_no == 1 and email.lower() in ('email', 'e-mail'):
+            continue
+        result = {'line': line_no, 'email': email, 'role': role, 'status': 'erstellt', 'message': '', 'password': None}
+        if not IMPORT_EMAIL_PATTERN.fullmatch(email):
+            result.update(status='fehler', message='Ungültige E-Mail-Adresse')
+        elif role not in ('admin', 'teilnehmer'):
+            result.update(status='fehler', message='Ungültige Rolle')
+        elif email.lower() in seen:
+            result.update(status='übersprungen', message='Doppelt in der Datei')
+        seen.add(email.lower())
+        results.append(result)
+
+    pending = [row for row in results if row['status'] == 'erstellt']
+    existing = {user['email'].lower() for user in user_collection.find(
+        {'email': {'$in': [re.compile(f"^{re.escape(row['email'])}$", re.IGNORECASE) for row in pending]}},
+        {'email': 1}
+    )} if pending else set()
+    for row in pending:
+        if row['email'].lower() in existing:
+            row.update(status='übersprungen', message='E-Mail-Adresse bereits registriert')
+    pending = [row for row in pending if row['status'] == 'erstellt']
+    if not pending:
+        return results
+
+    now = datetime.now().isoformat()
+    for row in pending:
+        row['password'] = secrets.token_urlsafe(8)
+    documents = [{
+        "email": row['email'],
+        "password": row['password'],
+        "role": row['role'],
+        "created_at": now,
+        "active": True
+    } for row in pending]
+    try:
+        user_collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            pending[error['index']].update(status='fehler', message='Konnte nicht gespeichert werden', password=None)
+    created = [row for row in pending if row['status'] == 'erstellt']
+
+    if SMTP_USER != "your-email@gmail.com":
+        enqueue_emails([(row['email'], *_welcome_email(row['email'], row['password'])) for row in created])
+        for row in created:
+            row['message'] = 'Zugangsdaten werden per E-Mail versendet'
+    return results
+
+
+@bp.route('/admin/analytics')
+@admin_required
+def admin_analytics():
+    today = date.today()
+    return render_template('admin_analytics.html',
+                           chart_from=(today - timedelta(days=27)).isoformat(), chart_to=today.isoformat())
+
+
+@bp.route('/api/admin/cohort')
+@admin_required
+def get_cohort_data():
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.args.get('from', (today - timedelta(days=27)).isoformat()))
+        end = date.fromisoformat(request.args.get('to', today.isoformat()))
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet wird JJJJ-MM-TT'}), 400
+    if end < start:
+        return jsonify({'error': "'to' darf nicht vor 'from' liegen"}), 400
+    return jsonify(_cohort_summary(start, end))
+
+
+def _cohort_summary(start, end):
+    """Daily and weekly cohort averages, participation and value distribution from the precomputed cohort aggregate."""
+    # Gleiche Mitgliedschaft wie im Aggregat (rebuild_cohort, _record_mood_change): die Rolle allein
+    participants_total = user_collection.count_documents({'role': 'teilnehmer'})
+    days = list(cohort_daily_collection.find(
+        {'date': {'$gte': start.isoformat(), '$lte': end.isoformat()}, 'count': {'$gt': 0}}, {'_id': 0}
+    ).sort('date', 1))
+
+    def rate(participants):
+        return round(participants / participants_total, 3) if participants_total else None
+
+    daily = {'labels': [], 'participants': [], 'participation_rate': []}
+    weekly_sums = OrderedDict()
+    distribution = {field: {str(value): 0 for value in range(MOOD_MIN, MOOD_MAX + 1)} for field in MOOD_FIELDS}
+    for field in MOOD_FIELDS:
+        daily[field] = []
+    for day in days:
+        daily['labels'].append(day['date'])
+        daily['participants'].append(day['participants'])
+        daily['participation_rate'].append(rate(day['participants']))
+        week = weekly_sums.setdefault(day['week'], {'count': 0, **{field: 0 for field in MOOD_FIELDS}})
+        week['count'] += day['count']
+        for field in MOOD_FIELDS:
+            daily[field].append(day[f"{field}_sum"] / day['count'])
+            week[field] += day[f"{field}_sum"]
+            for value, count in day.get(f"{field}_hist", {}).items():
+                distribution[field][value] = distribution[field].get(value, 0) + count
+
+    week_participants = {row['week']: row['participants'] for row in cohort_weekly_collection.find(
+        {'week': {'$in': list(weekly_sums)}}, {'_id': 0}
+    )}
+    weekly = {'labels': [], 'participants': [], 'participation_rate': []}
+    for field in MOOD_FIELDS:
+        weekly[field] = []
+    for week, sums in weekly_sums.items():
+        weekly['labels'].append(week)
+        weekly['participants'].append(week_participants.get(week, 0))
+        weekly['participation_rate'].append(rate(week_participants.get(week, 0)))
+        for field in MOOD_FIELDS:
+            weekly[field].append(sums[field] / sums['count'])
+    return {
+        'participants_total': participants_total,
+        'daily': daily,
+        'weekly': weekly,
+        'distribution': distribution,
+    }
+
+
+@bp.route('/admin/emails')
+@admin_required
+def admin_emails():
+    email_outbox.ensure_started()
+    status_filter = request.args.get('status')
+    query = {'status': status_filter} if status_filter else {}
+    mails = list(outbox_collection.find(query, {'body': 0}).sort('created_at', -1).limit(100))
+    counts = {row['_id']: row['count'] for row in outbox_collection.aggregate([
+        {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+    ])}
+    return render_template('admin_emails.html', mails=mails, counts=counts, status_filter=status_filter)
+
+
+@bp.route('/admin/emails/<mail_id>/retry', methods=['POST'])
+@admin_required
+def retry_email(mail_id):
+    try:
+        mail_id = ObjectId(mail_id)
+    except InvalidId:
+        flash('E-Mail nicht gefunden', 'error')
+        return redirect(url_for('main.admin_emails'))
+    result = outbox_collection.update_one(
+        {'_id': mail_id, 'status': 'failed', 'body': {'$exists': True}},
+        {'$set': {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.now().isoformat()}}
+    )
+    if result.modified_count:
+        email_outbox.wake()
+        flash('E-Mail wird erneut versendet', 'success')
+    else:
+        flash('E-Mail nicht gefunden oder nicht fehlgeschlagen', 'error')
+    return redirect(url_for('main.admin_emails'))
+
+
+@bp.route('/admin/delete-user/<user_id>')
 @admin_required
 def delete_user(user_id):
-    user_collection.delete_one({"_id": ObjectId(user_id)})
+    user = user_collection.find_one_and_delete({"_id": ObjectId(user_id)}, projection={'role': 1})
+    auth_cache.invalidate(user_id)
+    if user and user.get('role') == 'teilnehmer':
+        _shift_user_in_cohort(user_id, -1)
     flash('Benutzer gelöscht', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
 
-@app.route('/admin/update-role/<user_id>', methods=['POST'])
+@bp.route('/admin/update-role/<user_id>', methods=['POST'])
 @admin_required
 def update_user_role(user_id):
     new_role = request.form.get('role')
     if new_role not in ['admin', 'teilnehmer']:
         flash('Ungültige Rolle', 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     # Verhindere, dass sich der aktuelle Admin selbst degradiert
     if str(user_id) == session.get('user_id') and new_role != 'admin':
         flash('Du kannst deine eigene Admin-Rolle nicht entfernen', 'error')
-        return redirect(url_for('admin_dashboard'))
-    user_collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"role": new_role}})
+        return redirect(url_for('main.admin_dashboard'))
+    previous = user_collection.find_one_and_update(
+        {"_id": ObjectId(user_id)}, {"$set": {"role": new_role}}, projection={'role': 1}
+    )
+    auth_cache.invalidate(user_id)
+    if previous and previous.get('role') != new_role:
+        _shift_user_in_cohort(user_id, 1 if new_role == 'teilnehmer' else -1)
     flash('Rolle aktualisiert', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
 
-@app.route('/admin/reset-password/<user_id>', methods=['GET', 'POST'])
+@bp.route('/admin/reset-password/<user_id>', methods=['GET', 'POST'])
 @admin_required
 def reset_user_password(user_id):
     user = user_collection.find_one({"_id": ObjectId(user_id)})
     if not user:
         flash('Benutzer nicht gefunden', 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     if request.method == 'POST':
         new_password = request.form['new_password']
         if len(new_password) < 6:
             flash('Passwort muss mindestens 6 Zeichen lang sein', 'error')
             return render_template('reset_password.html', user=user)
         user_collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"password": new_password}})
+        auth_cache.invalidate(user_id)
         flash(f'Passwort für {user["email"]} wurde geändert', 'success')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     return render_template('reset_password.html', user=user)
 
 
-@app.route('/change-password', methods=['GET', 'POST'])
+@bp.route('/change-password', methods=['GET', 'POST'])
 @login_required
 def change_password():
     if request.method == 'POST':
@@ -244,11 +1168,11 @@ def change_password():
             return render_template('change_password.html')
         user_collection.update_one({"_id": ObjectId(session['user_id'])}, {"$set": {"password": new_password}})
         flash('Passwort erfolgreich geändert', 'success')
-        return redirect(url_for('mood_tracker'))
+        return redirect(url_for('main.mood_tracker'))
     return render_template('change_password.html')
 
 
-@app.route('/mood-tracker')
+@bp.route('/mood-tracker')
 @login_required
 def mood_tracker():
     current_month = date.today().replace(day=1)
@@ -257,10 +1181,12 @@ def mood_tracker():
         'user_id': session['user_id'],
         'date': {'$gte': current_month.isoformat(), '$lt': next_month.isoformat()}
     }).sort('date', 1))
-    return render_template('mood_tracker.html', moods=moods, view_type='monthly', today=date.today().isoformat())
+    return render_template('mood_tracker.html', moods=moods, view_type='monthly', today=date.today().isoformat(),
+                           chart_from=current_month.isoformat(),
+                           chart_to=(next_month - timedelta(days=1)).isoformat())
 
 
-@app.route('/mood-tracker/weekly')
+@bp.route('/mood-tracker/weekly')
 @login_required
 def mood_tracker_weekly():
     today = date.today()
@@ -270,10 +1196,12 @@ def mood_tracker_weekly():
         'user_id': session['user_id'],
         'date': {'$gte': start_of_week.isoformat(), '$lt': end_of_week.isoformat()}
     }).sort('date', 1))
-    return render_template('mood_tracker.html', moods=moods, view_type='weekly', today=date.today().isoformat())
+    return render_template('mood_tracker.html', moods=moods, view_type='weekly', today=date.today().isoformat(),
+                           chart_from=start_of_week.isoformat(),
+                           chart_to=(end_of_week - timedelta(days=1)).isoformat())
 
 
-@app.route('/add_mood', methods=['POST'])
+@bp.route('/add_mood', methods=['POST'])
 @login_required
 def add_mood():
     if request.method == 'POST':
@@ -282,6 +1210,12 @@ def add_mood():
         wellbeing = int(request.form['wellbeing'])
         note = request.form.get('note', '')
         selected_date = request.form.get('selected_date', date.today().isoformat())
+        try:
+            if _parse_mood_date(selected_date) < MOOD_MIN_DATE:
+                raise ValueError(selected_date)
+        except ValueError:
+            flash('Ungültiges Datum', 'error')
+            return redirect(url_for('main.mood_tracker'))
         mood_entry = {
             'user_id': session['user_id'],
             'date': selected_date,
@@ -291,73 +1225,450 @@ def add_mood():
             'note': note,
             'created_at': datetime.now().isoformat()
         }
-        mood_collection.insert_one(mood_entry)
-    return redirect(url_for('mood_tracker'))
+        idempotency_key = request.form.get('idempotency_key')
+        if idempotency_key:
+            mood_entry['idempotency_key'] = idempotency_key
+        try:
+            mood_collection.insert_one(mood_entry)
+        except DuplicateKeyError:
+            flash('Dieser Eintrag wurde bereits gespeichert', 'warning')
+            return redirect(url_for('main.mood_tracker'))
+        _record_mood_change(session['user_id'], [mood_entry])
+        _bump_data_version()
+    return redirect(url_for('main.mood_tracker'))
 
 
-@app.route('/delete_mood/<mood_id>')
+@bp.route('/api/moods/batch', methods=['POST'])
+@login_required
+def add_moods_batch():
+    payload = request.get_json(silent=True)
+    entries = payload.get('entries') if isinstance(payload, dict) else None
+    if not isinstance(entries, list):
+        return jsonify({'error': "Erwartet wird ein JSON-Objekt mit einer Liste 'entries'"}), 400
+    if len(entries) > MOOD_BATCH_MAX_ENTRIES:
+        return jsonify({'error': f'Höchstens {MOOD_BATCH_MAX_ENTRIES} Einträge pro Anfrage'}), 400
+    user_id = session['user_id']
+    results = []
+    valid = []
+    for index, raw in enumerate(entries):
+        entry, errors = _validate_mood_entry(raw)
+        key = raw.get('idempotency_key') if isinstance(raw, dict) else None
+        results.append({'index': index, 'idempotency_key': key, 'status': 'invalid' if errors else 'created'})
+        if errors:
+            results[-1]['errors'] = errors
+            continue
+        entry['user_id'] = user_id
+        valid.append((index, entry))
+    if not valid:
+        return jsonify(_batch_summary(results))
+
+    duplicates = set()
+    failed = {}
+    existing = {}
+    try:
+        mood_collection.bulk_write([InsertOne(entry) for _, entry in valid], ordered=False)
+    except BulkWriteError as e:
+        # ordered=False: alle Einträge ohne writeError sind gespeichert und müssen in die Rollups
+        for error in e.details.get('writeErrors', []):
+            if error.get('code') == 11000:
+                duplicates.add(error['index'])
+            else:
+                failed[error['index']] = error.get('errmsg', 'Schreibfehler')
+    if duplicates:
+        keys = [valid[i][1]['idempotency_key'] for i in duplicates]
+        existing = {doc['idempotency_key']: doc['_id'] for doc in mood_collection.find(
+            {'user_id': user_id, 'idempotency_key': {'$in': keys}}, {'idempotency_key': 1})}
+    created = []
+    for position, (index, entry) in enumerate(valid):
+        if position in duplicates:
+            results[index]['status'] = 'duplicate'
+            results[index]['id'] = str(existing.get(entry['idempotency_key'], ''))
+            continue
+        if position in failed:
+            current_app.logger.error("Batch-Eintrag %s von %s nicht gespeichert: %s", index, user_id, failed[position])
+            results[index]['status'] = 'failed'
+            results[index]['errors'] = ['Eintrag konnte nicht gespeichert werden']
+            continue
+        results[index]['id'] = str(entry['_id'])
+        created.append(entry)
+    if created:
+        _record_mood_change(user_id, created)
+        _bump_data_version()
+    return jsonify(_batch_summary(results))
+
+
+def _parse_mood_date(value):
+    """Parse a strict 'YYYY-MM-DD' date; fromisoformat alone also accepts '20260301' or '2026-W10-1'."""
+    if not isinstance(value, str) or not re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+        raise ValueError(f'Ungültiges Datum: {value!r}')
+    return date.fromisoformat(value)
+
+
+def _validate_mood_entry(raw):
+    """Check one entry of a batch; returns (mood document, list of error messages)."""
+    if not isinstance(raw, dict):
+        return None, ['Eintrag muss ein JSON-Objekt sein']
+    errors = []
+    key = raw.get('idempotency_key')
+    if not isinstance(key, str) or not 0 < len(key) <= 128:
+        errors.append('idempotency_key fehlt oder ist länger als 128 Zeichen')
+    try:
+        day = _parse_mood_date(raw.get('date'))
+        if day > date.today():
+            errors.append('date liegt in der Zukunft')
+        elif day < MOOD_MIN_DATE:
+            errors.append(f'date liegt vor dem {MOOD_MIN_DATE.isoformat()}')
+    except (TypeError, ValueError):
+        errors.append('date muss im Format JJJJ-MM-TT sein')
+    for field in MOOD_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, bool) or not isinstance(value, int) or not MOOD_MIN <= value <= MOOD_MAX:
+            errors.append(f'{field} muss eine ganze Zahl von {MOOD_MIN} bis {MOOD_MAX} sein')
+    note = raw.get('note', '')
+    if not isinstance(note, str):
+        errors.append('note muss ein Text sein')
+    if errors:
+        return None, errors
+    entry = {
+        'date': day.isoformat(),
+        'note': note,
+        'idempotency_key': key,
+        'created_at': datetime.now().isoformat()
+    }
+    for field in MOOD_FIELDS:
+        entry[field] = raw[field]
+    return entry, []
+
+
+def _batch_summary(results):
+    summary = {'results': results}
+    for status in ('created', 'duplicate', 'invalid', 'failed'):
+        summary[status] = sum(1 for row in results if row['status'] == status)
+    return summary
+
+
+@bp.route('/delete_mood/<mood_id>')
 @login_required
 def delete_mood(mood_id):
     mood = mood_collection.find_one({"_id": ObjectId(mood_id), "user_id": session['user_id']})
     if mood:
-        mood_collection.delete_one({"_id": ObjectId(mood_id)})
+        result = mood_collection.delete_one({"_id": ObjectId(mood_id)})
+        if result.deleted_count:
+            _record_mood_change(mood['user_id'], [mood], sign=-1)
+            _bump_data_version()
         flash('Eintrag gelöscht', 'success')
     else:
         flash('Eintrag nicht gefunden oder keine Berechtigung', 'error')
-    return redirect(url_for('mood_tracker'))
+    return redirect(url_for('main.mood_tracker'))
 
 
-@app.route('/api/mood-data')
+@bp.route('/api/mood-data')
 @login_required
 def get_mood_data():
     current_month = date.today().replace(day=1)
     next_month = (current_month.replace(day=28) + timedelta(days=4)).replace(day=1)
-    moods = list(mood_collection.find({
-        'user_id': session['user_id'],
-        'date': {'$gte': current_month.isoformat(), '$lt': next_month.isoformat()}
-    }).sort('date', 1))
-    return _process_mood_data(moods)
+    try:
+        start = date.fromisoformat(request.args.get('from', current_month.isoformat()))
+        end = date.fromisoformat(request.args.get('to', (next_month - timedelta(days=1)).isoformat()))
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet wird JJJJ-MM-TT'}), 400
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"Ungültige Granularität, erlaubt: {', '.join(GRANULARITIES)}"}), 400
+    if end < start:
+        return jsonify({'error': "'to' darf nicht vor 'from' liegen"}), 400
+    params = f"{start.isoformat()}:{end.isoformat()}:{granularity}"
+    return _cached_json_response(
+        session['user_id'], params,
+        lambda: _process_mood_data(_aggregate_mood_data(session['user_id'], start, end, granularity))
+    )
 
 
-@app.route('/api/mood-data/weekly')
+@bp.route('/api/mood-stats')
 @login_required
-def get_mood_data_weekly():
+def get_mood_stats():
+    try:
+        series_days = min(max(int(request.args.get('days', '90')), 1), 3660)
+    except ValueError:
+        return jsonify({'error': "'days' muss eine ganze Zahl sein"}), 400
+    user_id = session['user_id']
     today = date.today()
-    start_of_week = today - timedelta(days=today.weekday())
-    end_of_week = start_of_week + timedelta(days=7)
-    moods = list(mood_collection.find({
-        'user_id': session['user_id'],
-        'date': {'$gte': start_of_week.isoformat(), '$lt': end_of_week.isoformat()}
-    }).sort('date', 1))
-    return _process_mood_data(moods)
-
-
-def _process_mood_data(moods):
-    daily_data = {}
-    for mood in moods:
-        day = mood['date']
-        if day not in daily_data:
-            daily_data[day] = {'motivation': [], 'mood': [], 'wellbeing': []}
-        daily_data[day]['motivation'].append(mood['motivation'])
-        daily_data[day]['mood'].append(mood['mood'])
-        daily_data[day]['wellbeing'].append(mood['wellbeing'])
+    return _cached_json_response(user_id, f"stats:{today.isoformat()}:{series_days}",
+                                 lambda: _compute_mood_stats(user_id, today, series_days))
+
+
+def _compute_mood_stats(user_id, today, series_days):
+    projection = {'_id': 0, 'date': 1, 'count': 1}
+    for field in MOOD_FIELDS:
+        projection[f"{field}_sum"] = 1
+    rollups = rollup_collection.find({'user_id': user_id, 'count': {'$gt': 0}}, projection)
+    days, counts, sums = mood_stats.load_daily_arrays(rollups)
+    return mood_stats.compute_mood_stats(days, counts, sums, today=today, series_days=series_days)
+
+
+def _bump_data_version():
+    """Mark the session's chart data as changed, so no worker serves a cache entry from before this write."""
+    session['data_version'] = secrets.token_urlsafe(6)
+
+
+def _cached_json_response(user_id, params, compute):
+    """Serve compute()'s result as JSON from the per-user cache, with ETag and conditional GET."""
+    session_version = session.get('data_version', '')
+    body = mood_cache.get(user_id, params, session_version)
+    if body is None:
+        body = current_app.json.dumps(compute())
+        mood_cache.set(user_id, params, body, session_version)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest())
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def _aggregate_mood_data(user_id, start, end, granularity='day'):
+    """Average the daily rollups of one user between start and end (inclusive) per day, week, month or year."""
+    period_keys = {
+        'day': '$date',
+        'week': '$week',
+        'month': {'$substr': ['$date', 0, 7]},
+        'year': {'$substr': ['$date', 0, 4]},
+    }
+    projection = {'_id': 0, 'date': 1, 'week': 1, 'count': 1}
+    group = {'_id': period_keys[granularity], 'count': {'$sum': '$count'}}
+    averages = {'_id': 0, 'period': '$_id'}
+    for field in MOOD_FIELDS:
+        projection[f"{field}_sum"] = 1
+        group[f"{field}_sum"] = {'$sum': f"${field}_sum"}
+        averages[field] = {'$divide': [f"${field}_sum", '$count']}
+    pipeline = [
+        {'$match': {
+            'user_id': user_id,
+            'date': {'$gte': start.isoformat(), '$lte': end.isoformat()},
+            'count': {'$gt': 0}
+        }},
+        {'$project': projection},
+        {'$group': group},
+        {'$project': averages},
+        {'$sort': {'period': 1}},
+    ]
+    return rollup_collection.aggregate(pipeline)
+
+
+def _process_mood_data(rows):
     chart_data = {'labels': [], 'motivation': [], 'mood': [], 'wellbeing': []}
-    for day in sorted(daily_data.keys()):
-        chart_data['labels'].append(day)
-        chart_data['motivation'].append(sum(daily_data[day]['motivation']) / len(daily_data[day]['motivation']))
-        chart_data['mood'].append(sum(daily_data[day]['mood']) / len(daily_data[day]['mood']))
-        chart_data['wellbeing'].append(sum(daily_data[day]['wellbeing']) / len(daily_data[day]['wellbeing']))
-    return jsonify(chart_data)
+    for row in rows:
+        chart_data['labels'].append(row['period'])
+        for field in MOOD_FIELDS:
+            chart_data[field].append(row[field])
+    return chart_data
+
+
+@bp.route('/api/mood-export')
+@login_required
+def export_moods():
+    return _mood_export_response({'user_id': session['user_id']}, [('date', ASCENDING)], EXPORT_FIELDS)
+
+
+@bp.route('/api/admin/mood-export')
+@admin_required
+def admin_export_moods():
+    query = {}
+    if request.args.get('user_id'):
+        query['user_id'] = request.args['user_id']
+    return _mood_export_response(query, [('user_id', ASCENDING), ('date', ASCENDING)],
+                                 ('user_id', 'user_email') + EXPORT_FIELDS)
+
+
+def _mood_export_response(query, sort, columns):
+    """Stream the matching moods as CSV or NDJSON, batch by batch, gzip-compressed if the client accepts it."""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Ungültiges Format, erlaubt: csv, ndjson'}), 400
+    date_range = {}
+    try:
+        if request.args.get('from'):
+            date_range['$gte'] = date.fromisoformat(request.args['from']).isoformat()
+        if request.args.get('to'):
+            date_range['$lte'] = date.fromisoformat(request.args['to']).isoformat()
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet wird JJJJ-MM-TT'}), 400
+    if date_range:
+        query = dict(query, date=date_range)
+    emails = None
+    if 'user_email' in columns:
+        emails = {str(user['_id']): user['email'] for user in user_collection.find({}, {'email': 1})}
+
+    chunks = _export_chunks(query, sort, columns, export_format, emails)
+    use_gzip = request.args.get('gzip', '1') != '0' and 'gzip' in request.headers.get('Accept-Encoding', '')
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(chunks, mimetype=mimetype)
+    filename = f"launetracker-{date.today().isoformat()}.{export_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _export_chunks(query, sort, columns, export_format, emails=None):
+    projection = {'_id': 0}
+    for column in columns:
+        if column != 'user_email':
+            projection[column] = 1
+    cursor = mood_collection.find(query, projection).sort(sort).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(columns)
+    rows = 0
+    for mood in cursor:
+        if emails is not None:
+            mood['user_email'] = emails.get(mood.get('user_id'), '')
+        if export_format == 'csv':
+            writer.writerow([mood.get(column, '') for column in columns])
+        else:
+            buffer.write(json.dumps({column: mood.get(column) for column in columns}, ensure_ascii=False))
+            buffer.write('\n')
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 def bootstrap_on_start():
+    ensure_indexes()
     create_admin_if_not_exists()
     remove_user_if_exists("d.feix.teiln@btz-koeln.net")
 
 
-bootstrap_on_start()
+@bp.route('/metrics')
+def metrics_endpoint():
+    authorized = bool(METRICS_TOKEN) and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"
+    )
+    if not authorized and 'user_id' in session:
+        info = _current_auth()
+        authorized = info is not None and info.role == 'admin'
+    if not authorized:
+        return Response('Admin-Berechtigung erforderlich\n', status=403, mimetype='text/plain')
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record_request_duration(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    metrics.http_request_duration.observe(
+        duration, request.endpoint or 'unbekannt', request.method, str(response.status_code)
+    )
+    if SLOW_REQUEST_SECONDS and duration >= SLOW_REQUEST_SECONDS:
+        current_app.logger.warning(
+            "Langsame Anfrage: %s %s -> %s in %.3f s", request.method, request.full_path.rstrip('?'),
+            response.status_code, duration
+        )
+    return response
+
+
+_render_timers = threading.local()
+
+
+def _start_template_timer(sender, template, context, **extra):
+    stack = getattr(_render_timers, 'stack', None)
+    if stack is None:
+        stack = _render_timers.stack = []
+    stack.append(time.perf_counter())
+
+
+def _record_template_duration(sender, template, context, **extra):
+    stack = getattr(_render_timers, 'stack', None)
+    if stack:
+        metrics.template_render_duration.observe(time.perf_counter() - stack.pop(), template.name or 'unbekannt')
+
+
+@bp.cli.command('bootstrap')
+def bootstrap_command():
+    """Indizes anlegen und Admin-Zugang einrichten (einmalig vor dem Start der Worker)."""
+    bootstrap_on_start()
+    click.echo("Datenbank eingerichtet.")
+
+
+def _load_secret_key(instance_path):
+    """Read the shared secret key from the instance folder, creating it once if it does not exist yet.
+
+    The key is written to a temporary file first and then hard-linked into place, so other
+    workers see either no file or the complete key; whoever loses the race reads the winner's key.
+    """
+    path = os.path.join(instance_path, 'secret_key')
+    os.makedirs(instance_path, exist_ok=True)
+    if not os.path.exists(path):
+        fd, tmp_path = tempfile.mkstemp(dir=instance_path, prefix='.secret_key-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(tmp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+
+def create_app(config=None):
+    """Create the Flask app; connects to MongoDB only on the first database access."""
+    app = Flask(__name__)
+    app.config.from_mapping(
+        SECRET_KEY=os.getenv("SECRET_KEY"),
+        **_mongo_settings
+    )
+    if config:
+        app.config.from_mapping(config)
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = _load_secret_key(app.instance_path)
+    with _mongo_lock:
+        for key in _mongo_settings:
+            if _mongo_settings[key] != app.config[key]:
+                _mongo_settings[key] = app.config[key]
+                _mongo_state.update(pid=None, client=None)
+    app.register_blueprint(bp)
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request_duration)
+    before_render_template.connect(_start_template_timer, app)
+    template_rendered.connect(_record_template_duration, app)
+    return app
+
+
+def __getattr__(name):
+    # `flask --app app` und `gunicorn app:app` bauen die App erst beim ersten Zugriff, nicht schon beim Import
+    if name == 'app':
+        with _mongo_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", "5000"))
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    create_app().run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
@@ -0,0 +1,95 @@
+"""Lightweight in-process histograms rendered in the Prometheus text exposition format."""
+from bisect import bisect_left
+import threading
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class Histogram:
+    """Cumulative histogram with a fixed set of label names; observe() costs one bisect and one lock."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            base = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                bucket_labels = ','.join(base + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(base)}}}" if base else ''
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'launetracker_http_request_duration_seconds', 'Dauer der HTTP-Anfragen', ('endpoint', 'method', 'status'))
+mongo_command_duration = registry.histogram(
+    'launetracker_mongo_command_duration_seconds', 'Dauer der MongoDB-Befehle', ('command', 'result'))
+mongo_documents_returned = registry.histogram(
+    'launetracker_mongo_documents_returned', 'Von MongoDB-Befehlen gelieferte Dokumente', ('command',),
+    buckets=COUNT_BUCKETS)
+template_render_duration = registry.histogram(
+    'launetracker_template_render_duration_seconds', 'Dauer des Jinja-Renderings', ('template',))
+smtp_send_duration = registry.histogram(
+    'launetracker_smtp_send_duration_seconds', 'Dauer des E-Mail-Versands', ('result',))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Record latency and returned documents of every MongoDB command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name, 'ok')
+        cursor = event.reply.get('cursor') if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get('firstBatch', cursor.get('nextBatch', ()))
+            mongo_documents_returned.observe(len(batch), event.command_name)
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name, 'error')
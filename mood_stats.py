@@ -0,0 +1,137 @@
+"""Trend statistics over a user's daily mood rollups, computed in vectorized NumPy passes."""
+from datetime import date
+
+import numpy as np
+
+FIELDS = ('motivation', 'mood', 'wellbeing')
+WEEKDAYS = ('Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So')
+ROLLING_WINDOWS = (7, 30)
+
+
+def load_daily_arrays(rollups):
+    """Pack daily rollup documents into (day ordinals, entry counts, value sums with one column per field)."""
+    rollups = [r for r in rollups if _is_iso_date(r.get('date'))]
+    days = np.fromiter((date.fromisoformat(r['date']).toordinal() for r in rollups), dtype=np.int32, count=len(rollups))
+    counts = np.fromiter((r['count'] for r in rollups), dtype=np.int32, count=len(rollups))
+    sums = np.array([[r[f"{field}_sum"] for field in FIELDS] for r in rollups], dtype=np.float64).reshape(-1, len(FIELDS))
+    order = np.argsort(days, kind='stable')
+    return days[order], counts[order], sums[order]
+
+
+def _is_iso_date(value):
+    try:
+        date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _nan_to_none(values):
+    return [None if np.isnan(v) else round(float(v), 3) for v in values]
+
+
+def _per_field(matrix):
+    return {field: _nan_to_none(matrix[:, i]) for i, field in enumerate(FIELDS)}
+
+
+def _rolling_means(dense_counts, dense_sums, window):
+    """Entry-weighted mean over the last `window` calendar days, for every day of the dense grid."""
+    cum_counts = np.concatenate(([0], np.cumsum(dense_counts)))
+    cum_sums = np.vstack((np.zeros((1, dense_sums.shape[1])), np.cumsum(dense_sums, axis=0)))
+    end = np.arange(1, len(dense_counts) + 1)
+    start = np.maximum(end - window, 0)
+    counts = cum_counts[end] - cum_counts[start]
+    sums = cum_sums[end] - cum_sums[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts[:, None] > 0, sums / counts[:, None], np.nan)
+
+
+def _streaks(days, last_day):
+    """Return (current, longest) run of consecutive days with entries; the current run may end on last_day or the day before.
+
+    `days` are the sorted, distinct day ordinals with entries.
+    """
+    if not len(days):
+        return 0, 0
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(days) - 1]))
+    lengths = ends - starts + 1
+    current = int(lengths[-1]) if days[-1] >= last_day - 1 else 0
+    return current, int(lengths.max())
+
+
+def _correlations(daily_means):
+    if len(daily_means) < 3:
+        return None
+    std = daily_means.std(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix = np.corrcoef(daily_means, rowvar=False)
+    result = {}
+    for i in range(len(FIELDS)):
+        for j in range(i + 1, len(FIELDS)):
+            value = matrix[i, j] if std[i] > 0 and std[j] > 0 else np.nan
+            result[f"{FIELDS[i]}_{FIELDS[j]}"] = None if np.isnan(value) else round(float(value), 3)
+    return result
+
+
+def compute_mood_stats(days, counts, sums, today=None, series_days=90):
+    """Compute summary, rolling averages, volatility, streaks, weekday profile and correlations.
+
+    `days`, `counts` and `sums` come from load_daily_arrays(); the rolling series cover the
+    last `series_days` calendar days up to today. Only those days plus the lookback of the
+    longest rolling window are laid out densely, however far back the first entry lies.
+    """
+    today = today or date.today()
+    if not len(days):
+        return {'entries': 0, 'days_logged': 0}
+
+    first = int(days[0])
+    last = max(int(days[-1]), today.toordinal())
+    series_start = max(first, last - series_days + 1)
+    grid_start = max(first, series_start - max(ROLLING_WINDOWS) + 1)
+    in_grid = days >= grid_start
+    index = days[in_grid] - grid_start
+    dense_counts = np.zeros(last - grid_start + 1, dtype=np.int64)
+    dense_counts[index] = counts[in_grid]
+    dense_sums = np.zeros((last - grid_start + 1, len(FIELDS)), dtype=np.float64)
+    dense_sums[index] = sums[in_grid]
+
+    daily_means = sums / counts[:, None]
+    total_entries = int(counts.sum())
+    overall = sums.sum(axis=0) / total_entries
+
+    weekday = (days + 6) % 7
+    weekday_counts = np.bincount(weekday, weights=counts, minlength=7)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weekday_means = np.column_stack([
+            np.bincount(weekday, weights=sums[:, i], minlength=7) / weekday_counts for i in range(len(FIELDS))
+        ])
+
+    current_streak, longest_streak = _streaks(days[counts > 0], last)
+
+    window = slice(series_start - grid_start, None)
+    labels = [date.fromordinal(day).isoformat() for day in range(series_start, last + 1)]
+    rolling = {str(size): _per_field(_rolling_means(dense_counts, dense_sums, size)[window]) for size in ROLLING_WINDOWS}
+
+    return {
+        'entries': total_entries,
+        'days_logged': int(len(days)),
+        'first_date': date.fromordinal(first).isoformat(),
+        'last_date': date.fromordinal(int(days[-1])).isoformat(),
+        'mean': dict(zip(FIELDS, _nan_to_none(overall))),
+        'volatility': {
+            'std': dict(zip(FIELDS, _nan_to_none(daily_means.std(axis=0)))),
+            'mean_abs_change': dict(zip(FIELDS, _nan_to_none(
+                np.abs(np.diff(daily_means, axis=0)).mean(axis=0) if len(days) > 1 else np.full(len(FIELDS), np.nan)
+            ))),
+        },
+        'streaks': {'current': current_streak, 'longest': longest_streak},
+        'weekday_profile': {
+            'labels': list(WEEKDAYS),
+            'entries': [int(c) for c in weekday_counts],
+            **_per_field(weekday_means),
+        },
+        'correlations': _correlations(daily_means),
+        'rolling': {'labels': labels, **rolling},
+    }
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as launetracker  # noqa: E402
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """The app module with a fresh in-memory database for this test."""
+    monkeypatch.setitem(launetracker._mongo_state, 'pid', os.getpid())
+    monkeypatch.setitem(launetracker._mongo_state, 'client', mongomock.MongoClient())
+    launetracker.bootstrap_on_start()
+    return launetracker
+
+
+@pytest.fixture
+def flask_app(app_module):
+    """A Flask app built by the factory, sharing the test database."""
+    return app_module.create_app({'SECRET_KEY': 'test', 'TESTING': True})
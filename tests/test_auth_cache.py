@@ -0,0 +1,37 @@
+def test_role_change_is_seen_after_ttl_without_shared_backend(app_module, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(app_module.time, 'monotonic', lambda: clock[0])
+    user_id = str(app_module.user_collection.insert_one({'email': 'a@example.org', 'role': 'admin', 'active': True}).inserted_id)
+    # Zwei Worker: jeder hat seinen eigenen Prozess-Cache und Versionszähler
+    worker_a = app_module.AuthCache(app_module.InProcessCacheBackend(16), app_module.AUTH_CACHE_TTL)
+    worker_b = app_module.AuthCache(app_module.InProcessCacheBackend(16), app_module.AUTH_CACHE_TTL)
+    assert worker_b.get(user_id).role == 'admin'
+
+    app_module.user_collection.update_one({'email': 'a@example.org'}, {'$set': {'role': 'teilnehmer'}})
+    worker_a.invalidate(user_id)
+
+    assert worker_a.get(user_id).role == 'teilnehmer'
+    clock[0] += app_module.AUTH_CACHE_TTL + 0.1
+    assert worker_b.get(user_id).role == 'teilnehmer'
+
+
+def test_default_ttl_is_short_without_redis(app_module):
+    assert app_module.MOOD_CACHE_REDIS_URL or app_module.AUTH_CACHE_TTL <= 5
+
+
+def test_deleted_user_with_two_sessions_is_logged_out_in_both(app_module, flask_app):
+    user_id = app_module.user_collection.insert_one({'email': 'a@example.org', 'role': 'teilnehmer', 'active': True}).inserted_id
+    clients = [flask_app.test_client(), flask_app.test_client()]
+    for client in clients:
+        with client.session_transaction() as sess:
+            sess['user_id'] = str(user_id)
+            sess['user_role'] = 'teilnehmer'
+        assert client.get('/api/mood-data').status_code == 200
+
+    app_module.user_collection.delete_one({'_id': user_id})
+    app_module.auth_cache.invalidate(str(user_id))
+
+    for client in clients:
+        response = client.get('/api/mood-data')
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith('/login')
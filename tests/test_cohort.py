@@ -0,0 +1,72 @@
+import random
+
+
+def _snapshot(app_module):
+    """Cohort aggregate without ids and empty buckets, comparable between incremental updates and a rebuild."""
+    days = {}
+    for doc in app_module.cohort_daily_collection.find({}, {'_id': 0}):
+        if doc['count'] == 0 and doc['participants'] == 0:
+            continue
+        for field in app_module.MOOD_FIELDS:
+            doc[f"{field}_hist"] = {value: n for value, n in doc[f"{field}_hist"].items() if n}
+        days[doc['date']] = doc
+    weeks = {doc['week']: doc['participants']
+             for doc in app_module.cohort_weekly_collection.find({}, {'_id': 0}) if doc['participants']}
+    return days, weeks
+
+
+def _add(app_module, user_id, day, rng):
+    entry = {'user_id': user_id, 'date': day, **{field: rng.randint(-5, 5) for field in app_module.MOOD_FIELDS}}
+    app_module.mood_collection.insert_one(entry)
+    app_module._record_mood_change(user_id, [entry])
+    return entry
+
+
+def _delete(app_module, entry):
+    app_module.mood_collection.delete_one({'_id': entry['_id']})
+    app_module._record_mood_change(entry['user_id'], [entry], sign=-1)
+
+
+def _set_role(app_module, user_id, role):
+    # Wie update_user_role, aber ohne den auth_cache dieses Prozesses zu invalidieren (Änderung in einem anderen Worker)
+    previous = app_module.user_collection.find_one_and_update({'_id': user_id}, {'$set': {'role': role}})
+    if previous['role'] != role:
+        app_module._shift_user_in_cohort(str(user_id), 1 if role == 'teilnehmer' else -1)
+
+
+def test_incremental_cohort_matches_rebuild(app_module):
+    rng = random.Random(7)
+    users = [app_module.user_collection.insert_one(
+        {'email': f'u{i}@example.org', 'role': 'teilnehmer' if i % 3 else 'admin', 'active': True}).inserted_id
+        for i in range(6)]
+    days = [f'2026-02-{day:02d}' for day in range(1, 22)]
+    entries = []
+    for _ in range(120):
+        user_id = rng.choice(users)
+        # Rolle in diesem Prozess zwischenspeichern, damit ein veralteter Cache auffallen würde
+        app_module.auth_cache.get(str(user_id))
+        action = rng.random()
+        if action < 0.7 or not entries:
+            entries.append(_add(app_module, str(user_id), rng.choice(days), rng))
+        elif action < 0.9:
+            _delete(app_module, entries.pop(rng.randrange(len(entries))))
+        else:
+            _set_role(app_module, user_id, rng.choice(['admin', 'teilnehmer']))
+
+    incremental = _snapshot(app_module)
+    app_module.rebuild_cohort()
+    assert incremental == _snapshot(app_module)
+
+
+def test_participation_rate_counts_inactive_participants_on_both_sides(app_module):
+    rng = random.Random(3)
+    for active in (True, False):
+        user_id = app_module.user_collection.insert_one(
+            {'email': f'{active}@example.org', 'role': 'teilnehmer', 'active': active}).inserted_id
+        _add(app_module, str(user_id), '2026-02-02', rng)
+
+    summary = app_module._cohort_summary(app_module.date(2026, 2, 2), app_module.date(2026, 2, 2))
+
+    assert summary['participants_total'] == 2
+    assert summary['daily']['participation_rate'] == [1.0]
+    assert summary['weekly']['participation_rate'] == [1.0]
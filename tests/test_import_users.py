@@ -0,0 +1,47 @@
+def _by_email(results):
+    return {row['email']: row for row in results}
+
+
+def test_semicolon_separated_file_is_imported(app_module):
+    results = app_module._import_users_from_csv('email;role\r\nanna@example.org;admin\r\nben@example.org;\r\n')
+
+    assert [(row['email'], row['role'], row['status']) for row in results] == [
+        ('anna@example.org', 'admin', 'erstellt'),
+        ('ben@example.org', 'teilnehmer', 'erstellt'),
+    ]
+    assert app_module.user_collection.find_one({'email': 'anna@example.org'})['role'] == 'admin'
+
+
+def test_single_column_file_defaults_to_comma(app_module):
+    results = app_module._import_users_from_csv('anna@example.org\nben@example.org\n')
+
+    assert [row['status'] for row in results] == ['erstellt', 'erstellt']
+
+
+def test_malformed_addresses_are_rejected(app_module):
+    text = 'anna@example.org\n"a b@example.org"\n"a;b@example.org"\nohne-at.example.org\nc@localhost\n'
+    results = _by_email(app_module._import_users_from_csv(text))
+
+    assert results['anna@example.org']['status'] == 'erstellt'
+    for email in ('a b@example.org', 'a;b@example.org', 'ohne-at.example.org', 'c@localhost'):
+        assert results[email]['status'] == 'fehler'
+    assert app_module.user_collection.count_documents({'email': {'$ne': 'admin@launetracker.com'}}) == 1
+
+
+def test_duplicates_are_detected_case_insensitively(app_module):
+    app_module.user_collection.insert_one({'email': 'Bestand@Example.org', 'role': 'teilnehmer', 'active': True})
+    results = app_module._import_users_from_csv('anna@example.org\nAnna@Example.org\nbestand@example.org\n')
+
+    assert [row['status'] for row in results] == ['erstellt', 'übersprungen', 'übersprungen']
+    assert results[1]['message'] == 'Doppelt in der Datei'
+    assert results[2]['message'] == 'E-Mail-Adresse bereits registriert'
+
+
+def test_semicolon_file_with_ragged_rows(app_module):
+    results = app_module._import_users_from_csv('a@x.org;admin\nb@x.org;teilnehmer\nc@x.org\n')
+
+    assert [(row['email'], row['role'], row['status']) for row in results] == [
+        ('a@x.org', 'admin', 'erstellt'),
+        ('b@x.org', 'teilnehmer', 'erstellt'),
+        ('c@x.org', 'teilnehmer', 'erstellt'),
+    ]
@@ -0,0 +1,43 @@
+from pymongo.errors import BulkWriteError
+
+
+def test_entries_stored_before_a_write_error_reach_the_rollups(app_module, flask_app, monkeypatch):
+    user_id = str(app_module.user_collection.insert_one(
+        {'email': 'a@example.org', 'role': 'teilnehmer', 'active': True}).inserted_id)
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    entries = [{'date': '2026-03-0%d' % day, 'motivation': day, 'mood': 0, 'wellbeing': 0, 'idempotency_key': f'k{day}'}
+               for day in (1, 2, 3)]
+
+    real_bulk_write = app_module.mood_collection.bulk_write
+
+    def bulk_write_rejecting_second(requests, ordered=True):
+        # Wie der Server bei ordered=False: alle anderen Einträge werden trotzdem geschrieben
+        real_bulk_write([requests[0], requests[2]], ordered=ordered)
+        raise BulkWriteError({'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'Document failed validation'}],
+                              'nInserted': 2})
+
+    monkeypatch.setattr(app_module.mood_collection._get_current_object(), 'bulk_write', bulk_write_rejecting_second)
+    summary = client.post('/api/moods/batch', json={'entries': entries}).get_json()
+
+    assert [row['status'] for row in summary['results']] == ['created', 'failed', 'created']
+    assert (summary['created'], summary['failed']) == (2, 1)
+    rollups = {doc['date']: doc['count'] for doc in app_module.rollup_collection.find({'user_id': user_id})}
+    assert rollups == {'2026-03-01': 1, '2026-03-03': 1}
+
+
+def test_dates_must_be_canonical_and_not_too_old(app_module, flask_app):
+    user_id = str(app_module.user_collection.insert_one(
+        {'email': 'a@example.org', 'role': 'teilnehmer', 'active': True}).inserted_id)
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    dates = ['20260301', '2026-W10-1', '0001-01-01', '2026-3-1', '2026-03-01']
+    entries = [{'date': day, 'motivation': 1, 'mood': 1, 'wellbeing': 1, 'idempotency_key': f'k{i}'}
+               for i, day in enumerate(dates)]
+
+    summary = client.post('/api/moods/batch', json={'entries': entries}).get_json()
+
+    assert [row['status'] for row in summary['results']] == ['invalid'] * 4 + ['created']
+    assert [doc['date'] for doc in app_module.mood_collection.find({'user_id': user_id})] == ['2026-03-01']
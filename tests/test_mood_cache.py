@@ -0,0 +1,28 @@
+from datetime import date
+
+
+def test_write_on_one_worker_is_visible_on_another(app_module, flask_app, monkeypatch):
+    user_id = str(app_module.user_collection.insert_one(
+        {'email': 'a@example.org', 'role': 'teilnehmer', 'active': True}).inserted_id)
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_role'] = 'teilnehmer'
+    # Zwei Worker ohne Redis: jeder hat seinen eigenen Cache und Versionszähler
+    worker_a = app_module.MoodDataCache(app_module.InProcessCacheBackend(64), 300)
+    worker_b = app_module.MoodDataCache(app_module.InProcessCacheBackend(64), 300)
+    today = date.today().isoformat()
+    url = f'/api/mood-data?from={today}&to={today}'
+
+    monkeypatch.setattr(app_module, 'mood_cache', worker_b)
+    before = client.get(url).get_json()
+
+    monkeypatch.setattr(app_module, 'mood_cache', worker_a)
+    response = client.post('/api/moods/batch', json={'entries': [
+        {'date': today, 'motivation': 3, 'mood': 2, 'wellbeing': 1, 'idempotency_key': 'k1'}]})
+    assert response.get_json()['created'] == 1
+
+    monkeypatch.setattr(app_module, 'mood_cache', worker_b)
+    after = client.get(url).get_json()
+    assert after != before
+    assert client.get(url).get_json() == after
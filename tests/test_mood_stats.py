@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import mood_stats
+
+TODAY = date(2026, 3, 18)  # Mittwoch
+
+
+def _rollup(day, count=1, motivation=0, mood=0, wellbeing=0):
+    return {'date': day.isoformat(), 'count': count,
+            'motivation_sum': motivation, 'mood_sum': mood, 'wellbeing_sum': wellbeing}
+
+
+def _stats(rollups, series_days=90):
+    return mood_stats.compute_mood_stats(*mood_stats.load_daily_arrays(rollups), today=TODAY, series_days=series_days)
+
+
+def test_empty_input():
+    assert _stats([]) == {'entries': 0, 'days_logged': 0}
+
+
+def test_single_day():
+    stats = _stats([_rollup(TODAY, count=2, motivation=4, mood=-2, wellbeing=6)])
+
+    assert stats['entries'] == 2
+    assert stats['mean'] == {'motivation': 2.0, 'mood': -1.0, 'wellbeing': 3.0}
+    assert stats['volatility']['mean_abs_change'] == {field: None for field in mood_stats.FIELDS}
+    assert stats['correlations'] is None
+    assert stats['streaks'] == {'current': 1, 'longest': 1}
+    assert stats['rolling']['labels'] == [TODAY.isoformat()]
+
+
+def test_rolling_means_are_weighted_by_entries_and_skip_empty_windows():
+    rollups = [_rollup(TODAY - timedelta(days=12), count=1, mood=4),
+               _rollup(TODAY - timedelta(days=3), count=3, mood=-3)]
+    stats = _stats(rollups, series_days=10)
+
+    assert len(stats['rolling']['labels']) == 10
+    assert stats['rolling']['labels'][-1] == TODAY.isoformat()
+    rolling_7 = stats['rolling']['7']['mood']
+    assert rolling_7[0] == 4.0  # Eintrag vor Beginn der Reihe zählt im Fenster mit
+    assert rolling_7[4] is None  # TODAY-11 bis TODAY-5 ohne Einträge
+    assert rolling_7[-1] == -1.0
+    assert stats['rolling']['30']['mood'][-1] == pytest.approx((4 - 3) / 4)
+
+
+@pytest.mark.parametrize('last_entry, current', [(TODAY, 3), (TODAY - timedelta(days=1), 3), (TODAY - timedelta(days=2), 0)])
+def test_current_streak_may_end_today_or_yesterday(last_entry, current):
+    rollups = [_rollup(last_entry - timedelta(days=i)) for i in range(3)]
+    rollups += [_rollup(last_entry - timedelta(days=i)) for i in range(10, 15)]
+
+    assert _stats(rollups)['streaks'] == {'current': current, 'longest': 5}
+
+
+def test_weekday_profile():
+    monday = TODAY - timedelta(days=2)
+    rollups = [_rollup(monday, count=2, mood=6), _rollup(monday - timedelta(days=7), count=1, mood=0),
+               _rollup(TODAY - timedelta(days=4), count=1, mood=-5)]
+    profile = _stats(rollups)['weekday_profile']
+
+    assert profile['labels'][0] == 'Mo'
+    assert profile['entries'] == [3, 0, 0, 0, 0, 1, 0]
+    assert profile['mood'][0] == 2.0
+    assert profile['mood'][5] == -5.0
+    assert profile['mood'][1] is None
+
+
+def test_correlations_with_zero_variance():
+    rollups = [_rollup(TODAY - timedelta(days=i), motivation=i, mood=2 * i, wellbeing=3) for i in range(5)]
+    correlations = _stats(rollups)['correlations']
+
+    assert correlations['motivation_mood'] == 1.0
+    assert correlations['motivation_wellbeing'] is None
+    assert correlations['mood_wellbeing'] is None
+
+
+def test_grid_is_bounded_by_series_days_for_ancient_entries(monkeypatch):
+    sizes = []
+    real_zeros = np.zeros
+    monkeypatch.setattr(mood_stats.np, 'zeros', lambda shape, *a, **kw: sizes.append(shape) or real_zeros(shape, *a, **kw))
+    stats = _stats([_rollup(date(1, 1, 1), mood=5), _rollup(TODAY, mood=1)], series_days=90)
+
+    assert max(shape if isinstance(shape, int) else shape[0] for shape in sizes) <= 90 + 30
+    assert stats['first_date'] == '0001-01-01'
+    assert stats['mean']['mood'] == 3.0
+    assert stats['streaks'] == {'current': 1, 'longest': 1}
+    assert len(stats['rolling']['labels']) == 90
@@ -0,0 +1,87 @@
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, session.authenticated))
+        return '250 OK'
+
+
+def _authenticator(server, session, envelope, mechanism, auth_data):
+    ok = auth_data.login == b'user@localhost' and auth_data.password == b'geheim'
+    return AuthResult(success=ok, handled=False)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(app_module, monkeypatch):
+    """Local SMTP server that requires AUTH, with the app pointed at it."""
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname='127.0.0.1', port=port, authenticator=_authenticator,
+                            auth_required=True, auth_require_tls=False)
+    controller.start()
+    monkeypatch.setattr(app_module, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(app_module, 'SMTP_PORT', port)
+    monkeypatch.setattr(app_module, 'SMTP_STARTTLS', False)
+    monkeypatch.setattr(app_module, 'SMTP_USER', 'user@localhost')
+    monkeypatch.setattr(app_module, 'SMTP_PASSWORD', 'geheim')
+    # Die Hintergrund-Threads nicht starten, der Test leert den Postausgang selbst
+    monkeypatch.setattr(app_module.email_outbox, 'ensure_started', lambda: None)
+    yield handler
+    controller.stop()
+
+
+def test_outbox_sends_with_auth_over_one_connection(app_module, flask_app, smtp_server):
+    with flask_app.test_request_context():
+        for i in range(3):
+            app_module.enqueue_email(f'u{i}@example.org', 'Betreff', 'Text')
+    server, handled = app_module.email_outbox.drain_batch(None)
+    server.quit()
+
+    assert handled == 3
+    assert smtp_server.messages == [([f'u{i}@example.org'], True) for i in range(3)]
+    statuses = {mail['status'] for mail in app_module.outbox_collection.find()}
+    assert statuses == {'sent'}
+    assert app_module.outbox_collection.count_documents({'body': {'$exists': True}}) == 0
+
+
+def test_outbox_retries_when_login_is_rejected(app_module, smtp_server, monkeypatch):
+    monkeypatch.setattr(app_module, 'SMTP_PASSWORD', 'falsch')
+    app_module.enqueue_email('u@example.org', 'Betreff', 'Text')
+    server, handled = app_module.email_outbox.drain_batch(None)
+
+    assert server is None
+    assert handled == 1
+    assert smtp_server.messages == []
+    mail = app_module.outbox_collection.find_one()
+    assert mail['status'] == 'pending'
+    assert mail['attempts'] == 1
+    assert mail['last_error']
+
+
+def test_retry_with_malformed_id_is_not_found(app_module, flask_app):
+    admin = app_module.user_collection.find_one({'email': 'admin@launetracker.com'})
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = str(admin['_id'])
+        sess['user_role'] = 'admin'
+
+    response = client.post('/admin/emails/notanid/retry')
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/admin/emails')
+    with client.session_transaction() as sess:
+        assert sess['_flashes'] == [('error', 'E-Mail nicht gefunden')]
@@ -0,0 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_secret_key_is_created_once_and_shared(app_module, tmp_path):
+    instance = tmp_path / 'instance'
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = set(pool.map(lambda _: app_module._load_secret_key(str(instance)), range(32)))
+
+    assert len(keys) == 1
+    key = keys.pop()
+    assert len(key) == 64
+    assert (instance / 'secret_key').read_text() == key
+    assert [p.name for p in instance.iterdir()] == ['secret_key']